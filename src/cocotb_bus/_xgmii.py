@@ -0,0 +1,190 @@
+# Copyright cocotb contributors
+# Licensed under the Revised BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Helpers shared by the XGMII driver and monitor.
+
+This covers packing and unpacking bus words, and dumping packets to the log.
+"""
+
+import functools
+from typing import Callable, List, Tuple
+
+_XGMII_IDLE = 0x07  # noqa
+_XGMII_START = 0xFB  # noqa
+_XGMII_TERMINATE = 0xFD  # noqa
+
+
+def hexdump(data: bytes) -> str:
+    """Format *data* with :func:`scapy.utils.hexdump`.
+
+    Importing scapy is slow, so it is left until a dump is actually needed.
+    """
+    from scapy.utils import hexdump as _hexdump
+
+    return _hexdump(data, dump=True)
+
+
+def _compile(name: str, arg: str, body: List[str]) -> Callable:
+    """Compile a function of one argument from the lines of its body."""
+    source = f"def {name}({arg}):\n" + "".join(f"    {line}\n" for line in body)
+    namespace = {}
+    exec(source, namespace)
+    return namespace[name]
+
+
+def _gather_steps(nbytes: int, width: int) -> Tuple[Tuple[int, int, int], ...]:
+    """Steps to gather *width*-bit fields spaced every 9 bits into adjacent fields.
+
+    Field ``i`` has to move down by ``(9 - width) * i`` bits. Each step moves the
+    fields whose index has one particular bit set, lowest bit first, so that no
+    two fields overlap along the way and the gather takes ``log2(nbytes)``
+    steps instead of one per field.
+
+    Returns:
+        ``(keep, move, shift)`` tuples, apply each as
+        ``value = (value & keep) | ((value & move) >> shift)``.
+    """
+    field = (1 << width) - 1
+    positions = [9 * i for i in range(nbytes)]
+    steps = []
+    bit = 1
+    while bit < nbytes:
+        shift = (9 - width) * bit
+        move = sum(field << pos for i, pos in enumerate(positions) if i & bit)
+        steps.append((~move, move, shift))
+        positions = [pos - shift if i & bit else pos for i, pos in enumerate(positions)]
+        bit <<= 1
+    return tuple(steps)
+
+
+class XGMIILayout:
+    """Arrangement of the data bytes and control bits on an XGMII bus.
+
+    This only depends on the width of the bus and on whether the control bits
+    are interleaved, so use :func:`get_layout` to share instances.
+
+    Args:
+        nbytes: The number of bytes transferred per clock cycle.
+        interleaved: Whether control bits are interleaved with the data bytes.
+
+    Attributes:
+        pack_data: Function packing up to *nbytes* data bytes into consecutive
+            lanes, starting from the first. Returns the bus word with all
+            control bits clear.
+        unpack_word: Function splitting a bus word into its control bits and
+            data bytes. Returns the control bits as a mask, bit ``i`` being set
+            if lane ``i`` carries a control character, and the byte carried in
+            each lane.
+    """
+
+    def __init__(self, nbytes: int, interleaved: bool):
+        self.nbytes = nbytes
+        self.interleaved = interleaved
+
+        if interleaved:
+            self.lane_bits = 9
+            self.ctrl_shifts = tuple(9 * i + 8 for i in range(nbytes))
+        else:
+            self.lane_bits = 8
+            self.ctrl_shifts = tuple(nbytes * 8 + i for i in range(nbytes))
+        self.byte_shifts = tuple(self.lane_bits * i for i in range(nbytes))
+
+        self.start_integer = _XGMII_START | (1 << self.ctrl_shifts[0])
+
+        # Each lane holding an idle control character
+        lane_idle = [
+            (_XGMII_IDLE << byte_shift) | (1 << ctrl_shift)
+            for byte_shift, ctrl_shift in zip(self.byte_shifts, self.ctrl_shifts)
+        ]
+        self.idle_integer = sum(lane_idle)
+
+        # There are only nbytes ways to end a packet, a terminate control
+        # character in one of the lanes followed by idles in the rest
+        self.terminate_integers = tuple(
+            (_XGMII_TERMINATE << self.byte_shifts[index])
+            | (1 << self.ctrl_shifts[index])
+            | sum(lane_idle[index + 1 :])
+            for index in range(nbytes)
+        )
+
+        # The layout never changes, so generate pack_data() and unpack_word()
+        # with all the shifts and masks written in as literals
+        self.pack_data = _compile("pack_data", "data", self._pack_data_source())
+        self.unpack_word = _compile("unpack_word", "value", self._unpack_word_source())
+
+    def _pack_data_source(self) -> List[str]:
+        if not self.interleaved:
+            return ['return int.from_bytes(data, "little")']
+
+        # Spread the bytes out into their lanes, undoing the gather in reverse
+        lines = ['value = int.from_bytes(data, "little")']
+        for _, move, shift in reversed(_gather_steps(self.nbytes, 8)):
+            moved = move >> shift
+            lines.append(
+                f"value = (value & {~moved:#x}) | ((value & {moved:#x}) << {shift})"
+            )
+        lines.append("return value")
+        return lines
+
+    def _unpack_word_source(self) -> List[str]:
+        data_mask = sum(0xFF << shift for shift in self.byte_shifts)
+        to_bytes = f'to_bytes({self.nbytes}, "little")'
+        if not self.interleaved:
+            data = f"(value & {data_mask:#x}).{to_bytes}"
+            return [f"return value >> {8 * self.nbytes}, {data}"]
+
+        # Squeeze out the control bits between the data bytes, and gather up the
+        # control bits on their own
+        ctrl_mask = sum(1 << (shift - 8) for shift in self.ctrl_shifts)
+        lines = [f"data = value & {data_mask:#x}"]
+        for keep, move, shift in _gather_steps(self.nbytes, 8):
+            lines.append(f"data = (data & {keep:#x}) | ((data & {move:#x}) >> {shift})")
+        lines.append(f"ctrl_mask = (value >> 8) & {ctrl_mask:#x}")
+        for keep, move, shift in _gather_steps(self.nbytes, 1):
+            moved = f"((ctrl_mask & {move:#x}) >> {shift})"
+            lines.append(f"ctrl_mask = (ctrl_mask & {keep:#x}) | {moved}")
+        lines.append(f"return ctrl_mask, data.{to_bytes}")
+        return lines
+
+    def pack_frame(self, pkt: bytes) -> List[int]:
+        """Split a layer 1 packet into bus words.
+
+        Args:
+            pkt: The layer 1 packet, including preamble and CRC.
+
+        Returns:
+            One bus word per clock cycle, from the start character up to and
+            including the terminate character.
+        """
+        nbytes = self.nbytes
+        head = pkt[: nbytes - 1]
+        word = (self.pack_data(head) << self.lane_bits) | self.start_integer
+        # A packet too short to fill the start word ends in it too
+        if len(head) < nbytes - 1:
+            return [word | self.terminate_integers[len(head) + 1]]
+        words = [word]
+
+        for offset in range(nbytes - 1, len(pkt), nbytes):
+            chunk = pkt[offset : offset + nbytes]
+            word = self.pack_data(chunk)
+            if len(chunk) < nbytes:
+                word |= self.terminate_integers[len(chunk)]
+            words.append(word)
+
+        # The packet filled the last word, so terminate goes in a word of its own
+        if (len(pkt) - (nbytes - 1)) % nbytes == 0:
+            words.append(self.terminate_integers[0])
+
+        return words
+
+
+@functools.lru_cache(maxsize=None)
+def get_layout(nbytes: int, interleaved: bool) -> XGMIILayout:
+    """Get the :class:`XGMIILayout` for a kind of bus.
+
+    Args:
+        nbytes: The number of bytes transferred per clock cycle.
+        interleaved: Whether control bits are interleaved with the data bytes.
+    """
+    return XGMIILayout(nbytes, interleaved)
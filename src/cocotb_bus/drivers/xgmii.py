@@ -5,20 +5,23 @@
 
 """Drivers for XGMII (10 Gigabit Media Independent Interface)."""
 
-import struct
+import logging
 import zlib
+from typing import List
 
 from cocotb.handle import SimHandleBase
 from cocotb.triggers import RisingEdge
-from cocotb.types import LogicArray, Range
-from scapy.utils import hexdump
 
+from cocotb_bus._compat import BinaryType, create_binary
+from cocotb_bus._xgmii import (
+    _XGMII_IDLE,  # noqa: F401
+    _XGMII_START,  # noqa: F401
+    _XGMII_TERMINATE,  # noqa: F401
+    get_layout,
+    hexdump,
+)
 from cocotb_bus.drivers import Driver
 
-_XGMII_IDLE = 0x07  # noqa
-_XGMII_START = 0xFB  # noqa
-_XGMII_TERMINATE = 0xFD  # noqa
-
 # Preamble is technically supposed to be 7 bytes of 0x55 but it seems that it's
 # permissible for the start byte to replace one of the preamble bytes
 # see http://grouper.ieee.org/groups/802/3/10G_study/email/msg04647.html
@@ -57,6 +60,8 @@ class _XGMIIBus:
         self._interleaved = interleaved
         self._nbytes = nbytes
 
+        self._layout = get_layout(nbytes, interleaved)
+
     def __setitem__(self, index, value):
         byte, ctrl = value
 
@@ -68,12 +73,21 @@ class _XGMIIBus:
                 "Attempt to access byte %d of a %d byte bus" % (index, self._nbytes)
             )
 
-        if self._interleaved:
-            self._integer |= byte << (index * 9)
-            self._integer |= int(ctrl) << (9 * index + 8)
-        else:
-            self._integer |= byte << (index * 8)
-            self._integer |= int(ctrl) << (self._nbytes * 8 + index)
+        self._integer |= byte << self._layout.byte_shifts[index]
+        self._integer |= int(ctrl) << self._layout.ctrl_shifts[index]
+
+    def set_terminate(self, index: int) -> None:
+        """Set a terminate control character in a lane, and idles after it.
+
+        Args:
+            index: The lane for the terminate control character.
+        """
+        if index >= self._nbytes:
+            raise IndexError(
+                "Attempt to access byte %d of a %d byte bus" % (index, self._nbytes)
+            )
+
+        self._integer |= self._layout.terminate_integers[index]
 
     @property
     def value(self):
@@ -112,7 +126,18 @@ class XGMII(Driver):
         self.log = signal._log
         self.signal = signal
         self.clock = clock
+        self._clkedge = RisingEdge(clock)
         self.bus = _XGMIIBus(len(signal) // 9, interleaved=interleaved)
+        self._layout = get_layout(len(self.bus), interleaved)
+        # Idle and a terminate on its own are the same every time, so only
+        # create their values once
+        width = len(self.bus) * 9
+        self._idle_value = create_binary(
+            self._layout.idle_integer, width, big_endian=False
+        )
+        self._terminate_value = create_binary(
+            self._layout.terminate_integers[0], width, big_endian=False
+        )
         Driver.__init__(self)
         self.idle()
 
@@ -128,18 +153,23 @@ class XGMII(Driver):
         Returns:
             The formatted layer 1 packet.
         """
-        if len(packet) < 60:
-            padding = b"\x00" * (60 - len(packet))
-            packet += padding
-        return (
-            _PREAMBLE_SFD + packet + struct.pack("<I", zlib.crc32(packet) & 0xFFFFFFFF)
-        )
+        # Build the frame in place, the padding is already zero
+        start = len(_PREAMBLE_SFD)
+        end = start + max(60, len(packet))
+        frame = bytearray(end + 4)
+        frame[:start] = _PREAMBLE_SFD
+        frame[start : start + len(packet)] = packet
+
+        with memoryview(frame) as view:
+            crc = zlib.crc32(view[start:end])
+        frame[end:] = crc.to_bytes(4, "little")
+        return bytes(frame)
 
     def idle(self):
         """Helper function to set bus to IDLE state."""
-        for i in range(len(self.bus)):
-            self.bus[i] = (_XGMII_IDLE, True)
-        self.signal.value = self.bus.value
+        self.signal.value = self._idle_value
+        # Drop anything left on the bus helper, e.g. by terminate()
+        self.bus._integer = 0
 
     def terminate(self, index: int) -> None:
         """Helper function to terminate from a provided lane index.
@@ -147,11 +177,29 @@ class XGMII(Driver):
         Args:
             index: The index to terminate.
         """
-        self.bus[index] = (_XGMII_TERMINATE, True)
+        self.bus.set_terminate(index)
 
-        if index < len(self.bus) - 1:
-            for rem in range(index + 1, len(self.bus)):
-                self.bus[rem] = (_XGMII_IDLE, True)
+    def _pack_frame(self, pkt: bytes) -> List[BinaryType]:
+        """Split a layer 1 packet into the words to drive onto the bus.
+
+        Args:
+            pkt: The layer 1 packet, as returned by :meth:`layer1`.
+
+        Returns:
+            One bus value per clock cycle, from the start character through to
+            the bus going back to idle after the terminate character.
+        """
+        width = len(self.bus) * 9
+        *words, last = self._layout.pack_frame(pkt)
+        values = [create_binary(word, width, big_endian=False) for word in words]
+        # The last word holds the terminate character, along with the end of the
+        # packet unless that filled the word before
+        if last == self._layout.terminate_integers[0]:
+            values.append(self._terminate_value)
+        else:
+            values.append(create_binary(last, width, big_endian=False))
+        values.append(self._idle_value)
+        return values
 
     async def _driver_send(self, pkt: bytes, sync: bool = True) -> None:
         """Send a packet over the bus.
@@ -162,41 +210,17 @@ class XGMII(Driver):
         pkt = self.layer1(bytes(pkt))
 
         self.log.debug("Sending packet of length %d bytes" % len(pkt))
-        self.log.debug(f"Sending Packet:\n{hexdump(pkt, dump=True)}")
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug("Sending Packet:\n%s", hexdump(pkt))
 
-        clkedge = RisingEdge(self.clock)
-        if sync:
-            await clkedge
+        words = self._pack_frame(pkt)
 
-        self.bus[0] = (_XGMII_START, True)
-
-        for i in range(1, len(self.bus)):
-            self.bus[i] = (pkt[i - 1], False)
-
-        pkt = pkt[len(self.bus) - 1 :]
-        self.signal.value = self.bus.value
-        await clkedge
-
-        done = False
-
-        while pkt:
-            for i in range(len(self.bus)):
-                if i == len(pkt):
-                    self.terminate(i)
-                    pkt = b""
-                    done = True
-                    break
-                self.bus[i] = (pkt[i], False)
-
-            self.signal.value = self.bus.value
+        clkedge = self._clkedge
+        if sync:
             await clkedge
-            pkt = pkt[len(self.bus) :]
 
-        if not done:
-            self.terminate(0)
-            self.signal.value = self.bus.value
+        for word in words:
+            self.signal.value = word
             await clkedge
 
-        self.idle()
-        await clkedge
         self.log.debug("Successfully sent packet")
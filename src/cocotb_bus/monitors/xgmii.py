@@ -13,19 +13,19 @@ try:
 except ImportError:
     _have_scapy = False
 
-import struct
+import logging
 import zlib
 
 from cocotb.triggers import RisingEdge
-from scapy.utils import hexdump
 
+from cocotb_bus._xgmii import _XGMII_START, _XGMII_TERMINATE, get_layout, hexdump
 from cocotb_bus.monitors import Monitor
 
-_XGMII_IDLE = 0x07  # noqa
-_XGMII_START = 0xFB  # noqa
-_XGMII_TERMINATE = 0xFD  # noqa
-
 _PREAMBLE_SFD = b"\x55\x55\x55\x55\x55\x55\xd5"
+_PREAMBLE_SFD_INT = int.from_bytes(_PREAMBLE_SFD, "big")
+
+# Enough for a full-size frame, the buffer grows to fit anything longer
+_PKT_BUFFER_LEN = 1600
 
 
 class XGMII(Monitor):
@@ -56,104 +56,112 @@ class XGMII(Monitor):
         """
         self.log = signal._log
         self.clock = clock
+        self._clkedge = RisingEdge(clock)
         self.signal = signal
         self.bytes = len(self.signal) // 9
         self.interleaved = interleaved
+
+        self._layout = get_layout(self.bytes, interleaved)
         Monitor.__init__(self, callback=callback, event=event)
 
     def _get_bytes(self):
         """Take a value and extract the individual bytes and control bits.
 
-        Returns a tuple of lists.
+        Returns a tuple of the control bits as a mask (bit ``i`` set if lane ``i``
+        carries a control character) and the bytes of each lane.
         """
-        value = int(self.signal.value)
-        bytes = []
-        ctrls = []
-        byte_shift = 8
-        ctrl_base = 8 * self.bytes
-        ctrl_inc = 1
-        if self.interleaved:
-            byte_shift += 1
-            ctrl_base = 8
-            ctrl_inc = 9
-
-        for i in range(self.bytes):
-            bytes.append((value >> (i * byte_shift)) & 0xFF)
-            ctrls.append(bool(value & (1 << ctrl_base)))
-            ctrl_base += ctrl_inc
-
-        return ctrls, bytes
-
-    def _add_payload(self, ctrl, bytes):
-        """Take the payload and return true if more to come"""
-        for index, byte in enumerate(bytes):
-            if ctrl[index]:
-                if byte != _XGMII_TERMINATE:
-                    self.log.error("Got control character in XGMII payload")
-                    self.log.info("data = :" + " ".join(["%02X" % b for b in bytes]))
-                    self.log.info("ctrl = :" + " ".join(["%s" % str(c) for c in ctrl]))
-                    self._pkt = bytearray()
-                return False
-
-            self._pkt.append(byte)
-        return True
+        return self._layout.unpack_word(int(self.signal.value))
+
+    def _append(self, data):
+        """Copy bytes into the packet buffer after those already received."""
+        end = self._pkt_len + len(data)
+        self._pkt[self._pkt_len : end] = data
+        self._pkt_len = end
+
+    def _end_payload(self, ctrl_mask, data):
+        """Take the last word of the payload, the one with a control character"""
+        # Everything before the first control character is still payload
+        index = (ctrl_mask & -ctrl_mask).bit_length() - 1
+        self._append(data[:index])
+        if data[index] != _XGMII_TERMINATE:
+            self.log.error("Got control character in XGMII payload")
+            self.log.info("data = :" + " ".join(["%02X" % b for b in data]))
+            self.log.info(
+                "ctrl = :"
+                + " ".join([str(bool(ctrl_mask >> i & 1)) for i in range(len(data))])
+            )
+            self._pkt_len = 0
 
     async def _monitor_recv(self):
-        clk = RisingEdge(self.clock)
-        self._pkt = bytearray()
+        clk = self._clkedge
+        # Reused for every packet, with _pkt_len bytes of it in use
+        self._pkt = bytearray(_PKT_BUFFER_LEN)
+        self._pkt_len = 0
 
         while True:
             await clk
-            ctrl, bytes = self._get_bytes()
-
-            if ctrl[0] and bytes[0] == _XGMII_START:
-                ctrl, bytes = ctrl[1:], bytes[1:]
-
-                while self._add_payload(ctrl, bytes):
+            ctrl_mask, data = self._get_bytes()
+
+            if ctrl_mask & 1 and data[0] == _XGMII_START:
+                start = 1
+            elif self.bytes == 8 and ctrl_mask & (1 << 4) and data[4] == _XGMII_START:
+                start = 5
+            else:
+                start = 0
+
+            if start:
+                ctrl_mask, data = ctrl_mask >> start, data[start:]
+
+                # Only the end of the frame has control characters, so handle
+                # the all-data words here and leave the rest to _end_payload
+                while not ctrl_mask:
+                    self._append(data)
                     await clk
-                    ctrl, bytes = self._get_bytes()
+                    ctrl_mask, data = self._get_bytes()
 
-            elif self.bytes == 8:
-                if ctrl[4] and bytes[4] == _XGMII_START:
-                    ctrl, bytes = ctrl[5:], bytes[5:]
+                self._end_payload(ctrl_mask, data)
 
-                    while self._add_payload(ctrl, bytes):
-                        await clk
-                        ctrl, bytes = self._get_bytes()
+            if self._pkt_len:
+                pkt, length = self._pkt, self._pkt_len
+                self._pkt_len = 0
 
-            if self._pkt:
-                self.log.debug("Received:\n%s" % (hexdump(self._pkt, dump=True)))
+                if self.log.isEnabledFor(logging.DEBUG):
+                    self.log.debug("Received:\n%s", hexdump(pkt[:length]))
 
-                if len(self._pkt) < 64 + 7:
+                if length < 64 + 7:
                     self.log.error("Received a runt frame!")
-                if len(self._pkt) < 12:
+                if length < 12:
                     self.log.error("No data to extract")
-                    self._pkt = bytearray()
                     continue
 
-                preamble_sfd = self._pkt[0:7]
-                crc32 = self._pkt[-4:]
-                payload = self._pkt[7:-4]
+                preamble_sfd = pkt[0:7]
+                crc32 = pkt[length - 4 : length]
 
-                if preamble_sfd != _PREAMBLE_SFD:
+                if int.from_bytes(preamble_sfd, "big") != _PREAMBLE_SFD_INT:
                     self.log.error("Got a frame with unknown preamble/SFD")
-                    self.log.error(hexdump(preamble_sfd, dump=True))
-                    self._pkt = bytearray()
+                    self.log.error(hexdump(preamble_sfd))
                     continue
 
-                expected_crc = struct.pack("<I", (zlib.crc32(payload) & 0xFFFFFFFF))
+                # Check the CRC straight from the buffer, only copying out the
+                # payload itself
+                with memoryview(pkt)[7 : length - 4] as view:
+                    expected_crc = zlib.crc32(view).to_bytes(4, "little")
+                    payload = bytes(view)
 
                 if crc32 != expected_crc:
                     self.log.error("Incorrect CRC on received packet")
-                    self.log.info("Expected: %s" % (hexdump(expected_crc, dump=True)))
-                    self.log.info("Received: %s" % (hexdump(crc32, dump=True)))
+                    if self.log.isEnabledFor(logging.INFO):
+                        self.log.info("Expected: %s", hexdump(expected_crc))
+                        self.log.info("Received: %s", hexdump(crc32))
 
                 # Use scapy to decode the packet
                 if _have_scapy:
                     p = Ether(payload)
-                    self.log.debug("Received decoded packet:\n%s" % p.show2())
+                    if self.log.isEnabledFor(logging.DEBUG):
+                        self.log.debug(
+                            "Received decoded packet:\n%s", p.show2(dump=True)
+                        )
                 else:
                     p = payload
 
                 self._recv(p)
-                self._pkt = bytearray()
@@ -0,0 +1,99 @@
+# Copyright cocotb contributors
+# Licensed under the Revised BSD License, see LICENSE for details.
+# SPDX-License-Identifier: BSD-3-Clause
+
+"""Check the XGMII bus word packing against one lane at a time."""
+
+import random
+
+import cocotb
+
+from cocotb_bus._xgmii import (
+    _XGMII_IDLE,
+    _XGMII_START,
+    _XGMII_TERMINATE,
+    get_layout,
+)
+
+LAYOUTS = [(4, True), (4, False), (8, True), (8, False)]
+
+
+def lane_shifts(nbytes, interleaved, index):
+    """Bit positions of the data byte and control bit of a lane."""
+    if interleaved:
+        return 9 * index, 9 * index + 8
+    return 8 * index, 8 * nbytes + index
+
+
+def reference_pack_word(nbytes, interleaved, lanes):
+    """Pack ``(byte, ctrl)`` pairs into a bus word, one lane at a time."""
+    word = 0
+    for index, (byte, ctrl) in enumerate(lanes):
+        byte_shift, ctrl_shift = lane_shifts(nbytes, interleaved, index)
+        word |= byte << byte_shift
+        word |= int(ctrl) << ctrl_shift
+    return word
+
+
+def reference_unpack_word(nbytes, interleaved, word):
+    """Split a bus word into its control mask and data, one lane at a time."""
+    ctrl_mask = 0
+    data = bytearray()
+    for index in range(nbytes):
+        byte_shift, ctrl_shift = lane_shifts(nbytes, interleaved, index)
+        data.append((word >> byte_shift) & 0xFF)
+        ctrl_mask |= ((word >> ctrl_shift) & 1) << index
+    return ctrl_mask, bytes(data)
+
+
+def reference_pack_frame(nbytes, interleaved, pkt):
+    """Split a layer 1 packet into bus words, one byte at a time."""
+    lanes = [(_XGMII_START, True)]
+    lanes += [(byte, False) for byte in pkt]
+    lanes.append((_XGMII_TERMINATE, True))
+    while len(lanes) % nbytes:
+        lanes.append((_XGMII_IDLE, True))
+    return [
+        reference_pack_word(nbytes, interleaved, lanes[i : i + nbytes])
+        for i in range(0, len(lanes), nbytes)
+    ]
+
+
+@cocotb.test()
+async def test_unpack_word(_: object) -> None:
+    rng = random.Random(0)
+    for nbytes, interleaved in LAYOUTS:
+        layout = get_layout(nbytes, interleaved)
+        for _ in range(1000):
+            word = rng.getrandbits(9 * nbytes)
+            assert layout.unpack_word(word) == reference_unpack_word(
+                nbytes, interleaved, word
+            )
+
+
+@cocotb.test()
+async def test_pack_frame(_: object) -> None:
+    rng = random.Random(0)
+    for nbytes, interleaved in LAYOUTS:
+        layout = get_layout(nbytes, interleaved)
+        for length in range(3, 200):
+            pkt = bytes(rng.getrandbits(8) for _ in range(length))
+            assert layout.pack_frame(pkt) == reference_pack_frame(
+                nbytes, interleaved, pkt
+            )
+
+
+@cocotb.test()
+async def test_pack_frame_terminate_own_word(_: object) -> None:
+    for nbytes, interleaved in LAYOUTS:
+        layout = get_layout(nbytes, interleaved)
+        # Along with the start character this fills the last word exactly
+        pkt = bytes(range(1, 3 * nbytes))
+        words = layout.pack_frame(pkt)
+        assert words == reference_pack_frame(nbytes, interleaved, pkt)
+        assert len(words) == 4
+        assert words[-1] == layout.terminate_integers[0]
+        assert reference_unpack_word(nbytes, interleaved, words[-1]) == (
+            (1 << nbytes) - 1,
+            bytes([_XGMII_TERMINATE] + [_XGMII_IDLE] * (nbytes - 1)),
+        )